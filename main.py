@@ -2,11 +2,17 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from agent.agentic_workflow import GraphBuilder
 from utils.save_to_document import save_document
-from starlette.responses import JSONResponse
+from utils.weather_info import WeatherForecastTool
+from utils.currency_converter import CurrencyConverter
+from starlette.responses import JSONResponse, StreamingResponse
 import os
+import asyncio
 import datetime
+import requests
 from dotenv import load_dotenv
 from pydantic import BaseModel
+from typing import Optional
+from langchain_core.messages import AIMessageChunk
 load_dotenv()
 
 app = FastAPI()
@@ -21,6 +27,34 @@ app.add_middleware(
 class QueryRequest(BaseModel):
     question: str
 
+class EnrichRequest(BaseModel):
+    destination: str
+    start_date: Optional[str] = None
+    days: int = 1
+
+def _geocode_destination(destination: str):
+    """Look up approximate coordinates for a destination via Nominatim"""
+    resp = requests.get(
+        "https://nominatim.openstreetmap.org/search",
+        params={"q": destination, "format": "json"},
+        headers={"User-Agent": "trip-planner"},
+        timeout=10,
+    )
+    results = resp.json() if resp.status_code == 200 else []
+    if results:
+        return [float(results[0]["lat"]), float(results[0]["lon"])]
+    return None
+
+def _forecast_weather(destination: str):
+    """Fetch the weather forecast for a destination"""
+    api_key = os.environ.get("OPENWEATHERMAP_API_KEY")
+    return WeatherForecastTool(api_key).get_forecast_weather(destination) or None
+
+def _exchange_rate():
+    """Fetch a USD to INR reference rate"""
+    api_key = os.environ.get("EXCHANGE_RATE_API_KEY")
+    return {"usd_to_inr": CurrencyConverter(api_key).convert(1.0, "USD", "INR")}
+
 @app.post("/query")
 async def query_travel_agent(query:QueryRequest):
     try:
@@ -45,5 +79,51 @@ async def query_travel_agent(query:QueryRequest):
             final_output = str(output)
         
         return {"answer": final_output}
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+@app.post("/query_stream")
+async def query_travel_agent_stream(query:QueryRequest):
+    try:
+        print(query)
+        graph = GraphBuilder(model_provider="groq")
+        react_app=graph()
+
+        messages={"messages": [query.question]}
+
+        def token_stream():
+            # Forward LLM tokens as they arrive instead of waiting for the full answer.
+            # Only the agent node's AI chunks are streamed; tool output and other
+            # intermediate messages stay out of the answer, matching /query.
+            for msg_chunk, metadata in react_app.stream(messages, stream_mode="messages"):
+                if not isinstance(msg_chunk, AIMessageChunk):
+                    continue
+                if metadata.get("langgraph_node") != "agent":
+                    continue
+                content = getattr(msg_chunk, "content", "")
+                if content:
+                    yield content
+
+        return StreamingResponse(token_stream(), media_type="text/plain")
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+@app.post("/enrich")
+async def enrich_destination(req:EnrichRequest):
+    try:
+        # One round-trip for the UI: geocode, weather and FX fetched concurrently
+        coords, weather, fx = await asyncio.gather(
+            asyncio.to_thread(_geocode_destination, req.destination),
+            asyncio.to_thread(_forecast_weather, req.destination),
+            asyncio.to_thread(_exchange_rate),
+            return_exceptions=True,
+        )
+        def _or_none(value):
+            return None if isinstance(value, Exception) else value
+        return {
+            "coords": _or_none(coords),
+            "weather": _or_none(weather),
+            "fx": _or_none(fx),
+        }
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
\ No newline at end of file
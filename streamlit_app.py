@@ -1,10 +1,35 @@
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter, Retry
+import asyncio
+import httpx
+import pandas as pd
 import datetime
+import hashlib
 import io
 import re
-import textwrap
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Tuple, List
+from xml.sax.saxutils import escape
+
+# orjson (C implementation) beats stdlib json on large itinerary payloads
+try:
+    import orjson
+
+    def _json_dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+
+    def _json_loads(data):
+        return orjson.loads(data)
+except ImportError:
+    import json as _stdlib_json
+
+    def _json_dumps(obj) -> bytes:
+        return _stdlib_json.dumps(obj).encode("utf-8")
+
+    def _json_loads(data):
+        return _stdlib_json.loads(data)
 
 # -------- Settings --------
 BASE_URL = "http://localhost:8000"  # FastAPI backend
@@ -102,72 +127,195 @@ def build_prompt() -> str:
     return base + prefs + tone + extras + spec
 
 # --------- Request helpers ----------
-def call_backend(prompt: str) -> Tuple[bool, str]:
+@st.cache_resource
+def _http_session() -> requests.Session:
+    """One pooled Session per process so keep-alive skips TCP/TLS setup on repeat calls."""
+    s = requests.Session()
+    s.headers.update({"User-Agent": "trip-planner"})
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=Retry(total=2, backoff_factor=0.3))
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    return s
+
+@st.cache_resource
+def _pool() -> ThreadPoolExecutor:
+    """Small shared worker pool for side requests that should overlap the LLM call."""
+    return ThreadPoolExecutor(max_workers=4)
+
+async def _fetch_all(prompt: str, destination: str):
+    """Issue the backend query and the Nominatim geocode concurrently."""
+    async with httpx.AsyncClient(timeout=120) as client:
+        tasks = [client.post(
+            f"{BASE_URL}/query",
+            content=_json_dumps({"question": prompt}),
+            headers={"Content-Type": "application/json"},
+        )]
+        if destination:
+            tasks.append(client.get(
+                "https://nominatim.openstreetmap.org/search",
+                params={"q": destination, "format": "json"},
+                headers={"User-Agent": "trip-planner"},
+            ))
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+@st.cache_data(ttl=3600, max_entries=64, show_spinner=False)
+def fetch_plan_and_coords(prompt: str, destination: str) -> Tuple[str, Optional[Tuple[float, float]]]:
+    # Memoized per (prompt, destination) so reruns (tab clicks, Regenerate) skip the LLM round-trip.
+    # The geocode overlaps the (much longer) LLM call instead of running after it.
+    # Failures raise so st.cache_data never stores them and the next submit retries.
+    results = asyncio.run(_fetch_all(prompt, destination))
+
+    plan = results[0]
+    if isinstance(plan, Exception):
+        raise plan
+    if plan.status_code != 200:
+        raise RuntimeError(plan.text)
+    answer = _json_loads(plan.content).get("answer", "")
+
+    coords = None
+    if len(results) > 1 and not isinstance(results[1], Exception):
+        geo = results[1]
+        try:
+            hits = _json_loads(geo.content) if geo.status_code == 200 else []
+            if hits:
+                coords = (float(hits[0]["lat"]), float(hits[0]["lon"]))
+        except Exception:
+            pass
+    return answer, coords
+
+def stream_backend(prompt: str):
+    """Yield answer chunks from the streaming endpoint as the model produces them."""
+    with _http_session().post(
+        f"{BASE_URL}/query_stream",
+        data=_json_dumps({"question": prompt}),
+        headers={"Content-Type": "application/json"},
+        stream=True,
+        timeout=120,
+    ) as resp:
+        resp.raise_for_status()
+        for chunk in resp.iter_content(chunk_size=None, decode_unicode=True):
+            if chunk:
+                yield chunk
+
+@st.cache_data(ttl=1800, max_entries=32, show_spinner=False)
+def fetch_enrich(destination: str, start_date_iso: str, days: int) -> dict:
+    """One batched backend call for coords + weather + FX instead of three separate round-trips.
+
+    Failures raise (and so are never cached); callers treat an exception as no data.
+    """
+    resp = _http_session().post(
+        f"{BASE_URL}/enrich",
+        data=_json_dumps({"destination": destination, "start_date": start_date_iso, "days": days}),
+        headers={"Content-Type": "application/json"},
+        timeout=30,
+    )
+    resp.raise_for_status()
+    return _json_loads(resp.content)
+
+@st.cache_data(ttl=24 * 60 * 60, show_spinner=False)
+def geocode(destination: str) -> Optional[Tuple[float, float]]:
+    """Geocode a destination via Nominatim, cached for a day per destination."""
     try:
-        payload = {"question": prompt}
-        resp = requests.post(f"{BASE_URL}/query", json=payload, timeout=120)
-        if resp.status_code == 200:
-            return True, resp.json().get("answer", "")
-        else:
-            return False, resp.text
-    except Exception as e:
-        return False, str(e)
+        url = "https://nominatim.openstreetmap.org/search"
+        r = _http_session().get(url, params={"q": destination, "format": "json"})
+        hits = _json_loads(r.content) if r.ok else []
+        if hits:
+            return float(hits[0]["lat"]), float(hits[0]["lon"])
+    except Exception:
+        pass
+    return None
 
 # --------- Utils: parse budget from markdown (simple heuristic) ----------
-def extract_budget_lines(md: str) -> List[str]:
-    lines = md.splitlines()
-    hits = [ln for ln in lines if re.search(r"(budget|cost|₹|\$|INR|USD)", ln, re.I)]
-    return hits[:20]
+# Compiled once at import so reruns don't rebuild them
+_BUDGET_KEYWORD_RE = re.compile(r"(?i)budget|cost|₹|\$|INR|USD")
+_BUDGET_CAT_RE = re.compile(r"([A-Za-z ]+):\s*[₹$]?\s*([\d,]+)")
+_DAY_SPLIT_RE = re.compile(r"\n\s*Day\s*\d+[:：]", re.I)
+_DAY_HDR_RE = re.compile(r"\n\s*(Day\s*\d+[:：])", re.I)
+_WEATHER_RE = re.compile(r"(?ims)^\s*Weather.*?(?=\n\s*\n|\Z)")
+
+def parse_budget(md_lines: List[str]) -> Tuple[List[str], float, List[Tuple[str, float]]]:
+    """Single pass over pre-split markdown lines collecting budget-ish lines and (category, amount) pairs.
 
-def budget_totals_from_lines(lines: List[str]) -> Optional[Tuple[float, List[Tuple[str, float]]]]:
-    # Try to find total and categories like "Accommodation: ₹5000"
+    Only lines with a budget keyword or currency marker count — a bare
+    "Word: 123" (e.g. "Travelers: 2") is not a budget category.
+    """
+    lines: List[str] = []
+    cats: List[Tuple[str, float]] = []
     total = 0.0
-    cats = []
-    for ln in lines:
-        m = re.search(r"([A-Za-z ]+):\s*([₹$])?\s*([\d,]+)", ln)
+    for ln in md_lines:
+        if not _BUDGET_KEYWORD_RE.search(ln):
+            continue
+        lines.append(ln)
+        m = _BUDGET_CAT_RE.search(ln)
         if m:
-            name = m.group(1).strip()
-            amt = float(m.group(3).replace(",", ""))
-            cats.append((name, amt))
-    if cats:
-        total = sum(a for _, a in cats)
-        return total, cats
-    return None
+            amt = float(m.group(2).replace(",", ""))
+            cats.append((m.group(1).strip(), amt))
+            total += amt
+        if len(lines) >= 20:
+            break
+    return lines, total, cats
 
 # --------- Utils: PDF from Markdown text (simple) ----------
+# One compiled pass: links/images keep their text, structural markers and table pipes drop
+_MD_STRIP = re.compile(r"(?:!?\[(?P<text>[^\]]*)\]\([^)]*\))|[#_*`>|]+")
+
+def _md_to_text(md: str) -> str:
+    return _MD_STRIP.sub(lambda m: m.group("text") or "", md)
+
+@st.cache_resource
+def _reportlab():
+    """Import reportlab once per process, and only when a PDF is actually requested."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+    return A4, getSampleStyleSheet, SimpleDocTemplate, Paragraph, Spacer
+
+@st.cache_data(show_spinner=False, max_entries=16)
 def md_to_pdf_bytes(title: str, md: str) -> bytes:
+    # Memoized on (title, md) so tab switches and widget reruns reuse the rendered bytes
     try:
-        from reportlab.lib.pagesizes import A4
-        from reportlab.pdfgen import canvas
-        from reportlab.lib.units import cm
+        A4, getSampleStyleSheet, SimpleDocTemplate, Paragraph, Spacer = _reportlab()
         buffer = io.BytesIO()
-        c = canvas.Canvas(buffer, pagesize=A4)
-        width, height = A4
-        y = height - 2 * cm
-        # Title
-        c.setFont("Helvetica-Bold", 16)
-        c.drawString(2*cm, y, title)
-        y -= 1.2*cm
-        c.setFont("Helvetica", 11)
-        # naive markdown to text
-        text = re.sub(r"[#_*`>]+", "", md)
+        styles = getSampleStyleSheet()
+        doc = SimpleDocTemplate(buffer, pagesize=A4, title=title)
+        # naive markdown to text; Platypus wraps and paginates in compiled code
+        text = _md_to_text(md)
+        story = [Paragraph(escape(title), styles["Title"]), Spacer(1, 12)]
         for paragraph in text.split("\n\n"):
-            for line in textwrap.wrap(paragraph, width=95):
-                if y < 2*cm:
-                    c.showPage()
-                    y = height - 2 * cm
-                    c.setFont("Helvetica", 11)
-                c.drawString(2*cm, y, line)
-                y -= 0.6*cm
-            y -= 0.3*cm
-        c.showPage()
-        c.save()
+            if paragraph.strip():
+                story.append(Paragraph(escape(paragraph).replace("\n", "<br/>"), styles["BodyText"]))
+                story.append(Spacer(1, 6))
+        doc.build(story)
         buffer.seek(0)
         return buffer.read()
     except Exception:
         # reportlab not installed: return bytes of md so user still can download something
         return md.encode("utf-8")
 
+# --------- Utils: one-shot parse of a new answer ----------
+def ingest_answer(answer_md: str) -> None:
+    """Parse a new answer exactly once; tab bodies render from these session_state values.
+
+    Gated on a content hash so reruns (tab clicks, widget changes) skip the
+    day-split, budget and weather parsing entirely.
+    """
+    h = hashlib.blake2b(answer_md.encode(), digest_size=8).hexdigest()
+    if st.session_state.get("_answer_hash") == h:
+        return
+    st.session_state["_answer_hash"] = h
+    st.session_state["answer_md"] = answer_md
+    # Split once per response; every consumer reads the shared list
+    lines = answer_md.splitlines()
+    st.session_state["answer_lines"] = lines
+    st.session_state["_budget"] = parse_budget(lines)
+    headers = [hd.strip() for hd in _DAY_HDR_RE.findall(answer_md)]
+    parts = _DAY_SPLIT_RE.split(answer_md)
+    st.session_state["_preamble"] = parts[0]
+    st.session_state["_day_sections"] = list(zip(headers, parts[1:]))
+    m = _WEATHER_RE.search(answer_md)
+    st.session_state["_weather_chunk"] = m.group(0) if m else ""
+    st.session_state["_generated_at"] = datetime.datetime.now().strftime('%Y-%m-%d at %H:%M')
+
 # --------- Main UI ---------
 st.header("How can I help you in planning a trip? Let me know where do you want to visit.")
 
@@ -179,45 +327,110 @@ with st.form(key="query_form", clear_on_submit=False):
     with colB:
         regen_button = st.form_submit_button("Regenerate")
 
+# Rebuild the sidebar prompt only when a sidebar value actually changed
+_sidebar_key = (
+    destination, start_date.isoformat(), days, travelers, budget_level,
+    vibe, hotel_stars, must_include, avoid, language,
+)
+if st.session_state.get("_prompt_key") != _sidebar_key:
+    st.session_state["_prompt"] = build_prompt()
+    st.session_state["_prompt_key"] = _sidebar_key
+
 # Compose final prompt
 final_prompt = user_input.strip() if user_input.strip() else ""
 # If user didn't type, auto-compose from sidebar for them
 if not final_prompt and destination:
-    final_prompt = build_prompt()
+    final_prompt = st.session_state["_prompt"]
 
 if (submit_button or regen_button) and final_prompt:
-    with st.spinner("Crafting your itinerary..."):
-        ok, answer_md = call_backend(final_prompt)
+    ok, answer_md, coords = False, "", None
+    # Kick off the batched enrich (geocode/weather/FX) on a worker thread so it
+    # overlaps the LLM call instead of running after it
+    enrich_future = None
+    if destination:
+        enrich_future = _pool().submit(fetch_enrich, destination, start_date.isoformat(), int(days))
+    placeholder = st.empty()
+    try:
+        buf = []
+        last = time.monotonic()
+        for tok in stream_backend(final_prompt):
+            buf.append(tok)
+            now = time.monotonic()
+            # Batch placeholder updates (~20 fps) so rendering doesn't become the bottleneck
+            if now - last > 0.05:
+                placeholder.markdown("".join(buf))
+                last = now
+        answer_md = "".join(buf)
+        ok = bool(answer_md.strip())
+        placeholder.empty()
+    except Exception:
+        # Backend without /query_stream (or stream dropped): blocking cached path
+        with st.spinner("Crafting your itinerary..."):
+            try:
+                answer_md, coords = fetch_plan_and_coords(final_prompt, destination)
+                ok = True
+            except Exception as e:
+                ok, answer_md = False, str(e)
+    # One batched /enrich call covers the Map, Weather and Budget tabs;
+    # by now it has usually finished in the background
+    enrich = None
+    if enrich_future is not None:
+        try:
+            enrich = enrich_future.result(timeout=5)
+        except Exception:
+            enrich = None
+    st.session_state["enrich"] = enrich
+    if enrich and enrich.get("coords"):
+        coords = tuple(enrich["coords"])
+    st.session_state["coords"] = coords
 
     if ok:
-        st.markdown("## 🌎 AI Travel Plan")
-        meta = f"""
-> **Generated:** {datetime.datetime.now().strftime('%Y-%m-%d at %H:%M')}
+        ingest_answer(answer_md)
+    else:
+        st.error(" Bot failed to respond: " + str(answer_md))
+
+# Render from session_state so the plan survives reruns and tabs reuse parsed values
+if st.session_state.get("answer_md"):
+    answer_md = st.session_state["answer_md"]
+    st.markdown("## 🌎 AI Travel Plan")
+    meta = f"""
+> **Generated:** {st.session_state.get('_generated_at', '')}
 >
 > **Created by:** {CREATED_BY}
 
 ---
 """
-        st.markdown(meta)
-        # Tabs
-        tab_overview, tab_days, tab_map, tab_budget, tab_weather = st.tabs(
-            ["Overview", "Day Plan", "Map", "Budget", "Weather"]
-        )
-
-        # --- Overview ---
-        with tab_overview:
+    st.markdown(meta)
+    # Tabs
+    tab_overview, tab_days, tab_map, tab_budget, tab_weather = st.tabs(
+        ["Overview", "Day Plan", "Map", "Budget", "Weather"]
+    )
+
+    # --- Overview ---
+    with tab_overview:
+        day_sections = st.session_state.get("_day_sections") or []
+        if day_sections:
+            # Chunked render: the browser paints the teaser/preamble while later
+            # day sections are still being transmitted and parsed
+            st.markdown(st.session_state.get("_preamble", ""))
+            for hdr, section in day_sections:
+                st.markdown(f"**{hdr}**")
+                st.markdown(section)
+        else:
             st.markdown(answer_md)
 
-            # Export buttons
-            col1, col2 = st.columns(2)
-            with col1:
-                st.download_button(
-                    "⬇️ Download as Markdown",
-                    data=answer_md.encode("utf-8"),
-                    file_name=f"itinerary_{destination or 'trip'}.md",
-                    mime="text/markdown",
-                )
-            with col2:
+        # Export buttons
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button(
+                "⬇️ Download as Markdown",
+                data=answer_md.encode("utf-8"),
+                file_name=f"itinerary_{destination or 'trip'}.md",
+                mime="text/markdown",
+            )
+        with col2:
+            # Only run the reportlab pipeline when the user actually asks for a PDF
+            if st.button("🖨️ Prepare PDF"):
                 pdf_bytes = md_to_pdf_bytes(f"AI Travel Plan - {destination or ''}", answer_md)
                 st.download_button(
                     "⬇️ Download as PDF",
@@ -226,84 +439,74 @@ if (submit_button or regen_button) and final_prompt:
                     mime="application/pdf",
                 )
 
-        # --- Day Plan (collapsible) ---
-        with tab_days:
-            days_split = re.split(r"\n\s*Day\s*\d+[:：]", answer_md, flags=re.I)
-            headers = re.findall(r"\n\s*(Day\s*\d+[:：])", answer_md, flags=re.I)
-            if len(headers) >= 1:
-                for idx, section in enumerate(days_split[1:], start=1):
-                    hdr = headers[idx-1].strip()
-                    with st.expander(hdr, expanded=(idx==1)):
-                        st.markdown(section)
-            else:
-                st.info("Couldn't detect day sections reliably. Showing the full plan above.")
+    # --- Day Plan (collapsible) ---
+    with tab_days:
+        day_sections = st.session_state.get("_day_sections") or []
+        if day_sections:
+            for idx, (hdr, section) in enumerate(day_sections, start=1):
+                with st.expander(hdr, expanded=(idx==1)):
+                    st.markdown(section)
+        else:
+            st.info("Couldn't detect day sections reliably. Showing the full plan above.")
 
-        # --- Map (simple geocode of destination) ---
-        with tab_map:
-            try:
-                if destination:
-                    import requests as rq
-                    url = "https://nominatim.openstreetmap.org/search"
-                    r = rq.get(url, params={"q": destination, "format": "json"}, headers={"User-Agent":"trip-planner"})
-                    coords = None
-                    if r.ok and len(r.json()) > 0:
-                        jj = r.json()[0]
-                        lat, lon = float(jj["lat"]), float(jj["lon"])
-                        coords = (lat, lon)
-                    if coords:
-                        st.map(data={"lat":[coords[0]], "lon":[coords[1]]}, zoom=10)
-                        st.caption(f"Approximate location for **{destination}**")
-                    else:
-                        st.warning("Couldn't fetch map location for this destination.")
+    # --- Map (simple geocode of destination) ---
+    with tab_map:
+        try:
+            if destination:
+                # Prefer the result fetched alongside the LLM call; geocode only as a fallback
+                coords = st.session_state.get("coords") or geocode(destination)
+                if coords:
+                    st.map(data={"lat":[coords[0]], "lon":[coords[1]]}, zoom=10)
+                    st.caption(f"Approximate location for **{destination}**")
                 else:
-                    st.info("Enter a destination to see it on the map.")
-            except Exception as e:
-                st.warning(f"Map unavailable right now ({e}).")
-
-        # --- Budget ---
-        with tab_budget:
-            st.subheader("Budget highlights")
-            lines = extract_budget_lines(answer_md)
-            if lines:
-                st.write("\n".join([f"- {ln}" for ln in lines]))
-                res = budget_totals_from_lines(lines)
-                if res:
-                    total, cats = res
-                    st.metric("Estimated total (parsed)", f"{int(total):,}")
-                    try:
-                        import matplotlib.pyplot as plt
-                        fig = plt.figure()
-                        labels = [c[0] for c in cats][:8]
-                        values = [c[1] for c in cats][:8]
-                        plt.title("Budget breakdown")
-                        plt.bar(labels, values)
-                        plt.xticks(rotation=20, ha="right")
-                        st.pyplot(fig, clear_figure=True)
-                    except Exception as e:
-                        st.info(f"Install matplotlib to see a chart (pip install matplotlib). ({e})")
+                    st.warning("Couldn't fetch map location for this destination.")
             else:
-                st.info("No budget lines detected in the AI response. Try 'Include budget estimates' in the prompt.")
-
-        # --- Weather (lightweight) ---
-        with tab_weather:
-            st.subheader("Weather snapshot (from plan text)")
-            # naive: just show the weather section if model included one
-            weather_chunk = ""
-            in_weather = False
-            for ln in answer_md.splitlines():
-                if re.search(r"^\s*Weather", ln, re.I):
-                    in_weather = True
-                if in_weather:
-                    weather_chunk += ln + "\n"
-                if in_weather and ln.strip() == "":
-                    break
+                st.info("Enter a destination to see it on the map.")
+        except Exception as e:
+            st.warning(f"Map unavailable right now ({e}).")
+
+    # --- Budget ---
+    with tab_budget:
+        st.subheader("Budget highlights")
+        fx = (st.session_state.get("enrich") or {}).get("fx") or {}
+        if fx.get("usd_to_inr"):
+            st.caption(f"FX reference: 1 USD ≈ ₹{fx['usd_to_inr']:.1f}")
+        lines, total, cats = st.session_state.get("_budget") or ([], 0.0, [])
+        if lines:
+            st.write("\n".join([f"- {ln}" for ln in lines]))
+            if cats:
+                st.metric("Estimated total (parsed)", f"{int(total):,}")
+                # Vega-Lite chart rendered client-side; no matplotlib import or PNG round-trip
+                labels = [c[0] for c in cats][:8]
+                values = [c[1] for c in cats][:8]
+                st.caption("Budget breakdown")
+                st.bar_chart(pd.DataFrame({"amount": values}, index=labels))
+        else:
+            st.info("No budget lines detected in the AI response. Try 'Include budget estimates' in the prompt.")
+
+    # --- Weather (lightweight) ---
+    with tab_weather:
+        st.subheader("Weather snapshot")
+        enrich = st.session_state.get("enrich") or {}
+        forecast = (enrich.get("weather") or {}).get("list") or []
+        rows = []
+        try:
+            for item in forecast:
+                date = item["dt_txt"].split(" ")[0]
+                temp = item["main"]["temp"]
+                desc = item["weather"][0]["description"]
+                rows.append(f"{date}: {temp}°C, {desc}")
+        except Exception:
+            rows = []
+        if rows:
+            st.markdown("```\n" + "\n".join(rows) + "\n```")
+        else:
+            # fall back to whatever weather text the model included in the plan
+            weather_chunk = st.session_state.get("_weather_chunk", "")
             if weather_chunk.strip():
                 st.markdown(f"```\n{weather_chunk.strip()}\n```")
             else:
                 st.info("No explicit weather block found in the AI output. Try enabling a weather tool or ask for a weather summary.")
 
-    else:
-        st.error(" Bot failed to respond: " + str(answer_md))
-
 else:
     st.info("Tip: Set the sidebar options and click **Generate Plan** even without typing anything in the input box.")
@@ -1,7 +1,10 @@
 import yaml
 import os
+import functools
 
+@functools.lru_cache(maxsize=1)
 def load_config(config_path: str = "config/config.yaml") -> dict:
+    """Read and parse the YAML config once per process; later calls hit the cache."""
     with open(config_path, "r") as file:
         config = yaml.safe_load(file)
         # print(config)
@@ -1,12 +1,17 @@
 import os
+import functools
+import hashlib
+import httpx
 from dotenv import load_dotenv
 from typing import Literal, Optional, Any
 from pydantic import BaseModel, Field
 from utils.config_loader import load_config
 from langchain_groq import ChatGroq
 
-# Load environment variables
-load_dotenv()
+# Load environment variables once per process; re-imports skip the .env file walk
+if not os.environ.get("_DOTENV_LOADED"):
+    load_dotenv()
+    os.environ["_DOTENV_LOADED"] = "1"
 
 # Decommissioned / unsafe models
 DECOMMISSIONED = {
@@ -24,12 +29,35 @@ GROQ_ALLOWED_FALLBACKS = {
 
 class ConfigLoader:
     def __init__(self):
-        print("Loaded config.....")
+        if os.environ.get("TRIP_PLANNER_DEBUG"):
+            print("Loaded config.....")
         self.config = load_config()
 
     def __getitem__(self, key):
         return self.config[key]
 
+@functools.lru_cache(maxsize=1)
+def _shared_config_loader() -> ConfigLoader:
+    """One ConfigLoader per process so repeated ModelLoader construction skips disk I/O."""
+    return ConfigLoader()
+
+@functools.lru_cache(maxsize=4)
+def _build_chatgroq(model_name: str, api_key_hash: str) -> ChatGroq:
+    """Build (and reuse) one ChatGroq client per (model, key hash).
+
+    The bounded httpx pool keeps connections alive and shared across
+    concurrent requests instead of opening new ones per call.
+    """
+    return ChatGroq(
+        model=model_name,
+        api_key=os.environ["GROQ_API_KEY"],
+        temperature=0.2,
+        timeout=60,
+        http_client=httpx.Client(
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+        ),
+    )
+
 class ModelLoader(BaseModel):
     model_provider: Literal["groq"] = "groq"
     config: Optional[ConfigLoader] = Field(default=None, exclude=True)
@@ -38,7 +66,7 @@ class ModelLoader(BaseModel):
         arbitrary_types_allowed = True
 
     def model_post_init(self, __context: Any) -> None:
-        self.config = ConfigLoader()
+        self.config = _shared_config_loader()
 
     def _resolve_groq_model(self) -> str:
         """
@@ -82,9 +110,6 @@ class ModelLoader(BaseModel):
         if model_name not in {GROQ_DEFAULT, *GROQ_ALLOWED_FALLBACKS}:
             print(f"[INFO] Using custom Groq model: {model_name}")
 
-        return ChatGroq(
-            model=model_name,
-            api_key=groq_api_key,
-            temperature=0.2,
-            timeout=60,
-        )
+        # Key the cache on a hash so the raw key never sits in lru_cache internals
+        key_hash = hashlib.sha256(groq_api_key.encode()).hexdigest()
+        return _build_chatgroq(model_name, key_hash)